@@ -1,3 +1,4 @@
 from .solver import Solver, Solution, Cutout
 from .piece import Piece
 from .board import Board
+from .pattern_library import PatternLibrary
@@ -0,0 +1,220 @@
+from __future__ import annotations
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Iterator
+from .piece import Piece
+from .board import Board
+from .solution import Solution, Cutout
+from .solver_exact import SolverExact
+
+PATTERN_MAX_PIECES = 4
+'''Bigger groups are not packed into blocks'''
+
+type PieceKey = tuple[int, int, bool]
+
+
+def piece_key(piece: Piece) -> PieceKey:
+    '''Pieces that can rotate are the same piece whichever way they are described'''
+    h, w = piece.height_tmm, piece.width_tmm
+    if piece.can_rotate:
+        h, w = min(h, w), max(h, w)
+    return (h, w, piece.can_rotate)
+
+
+@dataclass(frozen=True)
+class Pattern:
+    '''A group of pieces packed together, cutout positions are relative to the bounding rectangle'''
+    members: tuple[PieceKey, ...]
+    cutouts: tuple[Cutout, ...]
+    height: float
+    width: float
+    saw_width: float
+
+    @property
+    def key(self) -> tuple[int, tuple[PieceKey, ...]]:
+        return _pattern_key(self.members, self.saw_width)
+
+    @property
+    def area(self) -> float:
+        return self.height * self.width
+
+    @property
+    def can_rotate(self) -> bool:
+        '''The block can turn if every piece in it can'''
+        return all(can_rotate for _, _, can_rotate in self.members)
+
+    def as_piece(self) -> Piece:
+        return Piece(self.height, self.width, can_rotate=self.can_rotate)
+
+    def place(self, cutout: Cutout) -> list[Cutout]:
+        '''The cutouts of the pieces once the block is cut at `cutout`, turned if the block was'''
+        (y, x), (h, w) = cutout.position_tl, cutout.dimensions
+        turned = (round(h, 1), round(w, 1)) != (self.height, self.width)
+        cutouts = []
+        for c in self.cutouts:
+            (cy, cx), (ch, cw) = c.position_tl, c.dimensions
+            if turned:
+                cy, cx, ch, cw = cx, cy, cw, ch
+            cutouts.append(Cutout(position_tl=(y + cy, x + cx), dimensions=(ch, cw)))
+        return cutouts
+
+    @staticmethod
+    def from_cutouts(group: list[tuple[Piece, Cutout]], saw_width: float) -> Pattern:
+        top = min(c.position_tl[0] for _, c in group)
+        left = min(c.position_tl[1] for _, c in group)
+        bottom = max(c.position_tl[0] + c.dimensions[0] for _, c in group)
+        right = max(c.position_tl[1] + c.dimensions[1] for _, c in group)
+        cutouts = tuple(Cutout(position_tl=(c.position_tl[0] - top, c.position_tl[1] - left),
+                               dimensions=c.dimensions) for _, c in group)
+        return Pattern(members=tuple(piece_key(p) for p, _ in group), cutouts=cutouts,
+                       height=round(bottom - top, 1), width=round(right - left, 1), saw_width=saw_width)
+
+
+class PatternLibrary:
+    '''Packed blocks of recurring groups of pieces, shared between jobs.
+
+    Groups are the pieces a straight cut separates from the rest of a solution. Each new
+    group is packed on its own in the bounding rectangle of least area, the least recently
+    used groups are evicted.
+    The hit rate is the share of looked up pieces that came out of a stored block.
+    The library is shared by the web server threads, everything goes through a lock.
+    '''
+    capacity: int
+    hits: int
+    misses: int
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._patterns: OrderedDict[tuple, Pattern] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._patterns)
+
+    def count(self, hits: int, misses: int):
+        '''Called once the solver knows whether the matched blocks were used'''
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    @property
+    def hit_rate(self) -> float:
+        with self._lock:
+            looked_up = self.hits + self.misses
+            return self.hits / looked_up if looked_up else 0.0
+
+    def record(self, solution: Solution, pieces: list[Piece]):
+        '''Only complete solutions are recorded since cutouts can only be matched to pieces then'''
+        if solution.unfits or len(solution.cutouts) != len(pieces):
+            return
+        saw_width = solution.board.saw_width
+        for block in _blocks(list(zip(pieces, solution.cutouts))):
+            members = [piece for piece, _ in block]
+            key = _pattern_key([piece_key(piece) for piece in members], saw_width)
+            with self._lock:
+                if key in self._patterns:
+                    self._patterns.move_to_end(key)
+                    continue
+            if len(members) > PATTERN_MAX_PIECES:
+                continue
+            # packing is slow, other threads can use the library meanwhile
+            pattern = _pack_block(members, solution.board)
+            if pattern is not None:
+                with self._lock:
+                    self._add(pattern)
+
+    def _add(self, pattern: Pattern):
+        '''Expects the lock to be held'''
+        self._patterns[pattern.key] = pattern
+        self._patterns.move_to_end(pattern.key)
+        while len(self._patterns) > self.capacity:
+            self._patterns.popitem(last=False)
+
+    def match(self, pieces: list[Piece], saw_width: float) -> list[tuple[Pattern, list[int]]]:
+        '''Greedily covers the pieces with stored blocks, biggest groups first.
+
+        Returns the blocks used with the indices of the pieces they stand for, in member order.
+        '''
+        saw_width_tmm = int(saw_width*10)
+        available: dict[PieceKey, list[int]] = {}
+        for i, piece in enumerate(pieces):
+            available.setdefault(piece_key(piece), []).append(i)
+        with self._lock:
+            return self._match(available, saw_width_tmm)
+
+    def _match(self, available: dict[PieceKey, list[int]], saw_width_tmm: int) -> list[tuple[Pattern, list[int]]]:
+        candidates = sorted((p for (sw, _), p in self._patterns.items() if sw == saw_width_tmm),
+                            key=lambda p: (-len(p.members), -p.area))
+        matches: list[tuple[Pattern, list[int]]] = []
+        for pattern in candidates:
+            needed = Counter(pattern.members)
+            while all(len(available.get(key, [])) >= n for key, n in needed.items()):
+                matches.append((pattern, [available[key].pop() for key in pattern.members]))
+                self._patterns.move_to_end(pattern.key)
+        return matches
+
+
+def _pattern_key(members, saw_width: float) -> tuple[int, tuple[PieceKey, ...]]:
+    return (int(saw_width*10), tuple(sorted(members)))
+
+
+def _pack_block(pieces: list[Piece], board: Board) -> Pattern | None:
+    '''Packs the pieces in the bounding rectangle of least area that fits the board.
+
+    Every width the pieces can add up to is tried, `SolverExact` gives the least depth for it.
+    None when the exact solver gives up.
+    '''
+    sw = board.saw_width_tmm
+    widths = {0}
+    for piece in pieces:
+        sides = {piece.width_tmm, piece.height_tmm} if piece.can_rotate else {piece.width_tmm}
+        widths |= {w + side + sw for w in widths for side in sides}
+    narrowest = max(min(p.width_tmm, p.height_tmm) if p.can_rotate else p.width_tmm
+                    for p in pieces)
+    area = sum((p.height_tmm + sw)*(p.width_tmm + sw) for p in pieces)
+    # tall enough to always minimize along the height
+    height = sum(max(p.height_tmm, p.width_tmm) + sw for p in pieces) + board.width_tmm
+    best: Pattern | None = None
+    for width in sorted(w - sw for w in widths if narrowest <= w - sw <= board.width_tmm):
+        if best is not None and width*(area/(width + sw) - sw) >= best.area*100:
+            continue
+        block_board = Board(height/10, width/10, board.saw_width)
+        solution = SolverExact(block_board, pieces).solve()
+        if solution is None:
+            return None
+        if solution.unfits:
+            continue
+        pattern = Pattern.from_cutouts(list(zip(pieces, solution.cutouts)), board.saw_width)
+        if pattern.height <= board.height and (best is None or pattern.area < best.area):
+            best = pattern
+    return best
+
+
+def _blocks(group: list[tuple[Piece, Cutout]]) -> Iterator[list[tuple[Piece, Cutout]]]:
+    '''Recursively, the strips of two pieces or more a straight cut through the group separates'''
+    for axis in (0, 1):
+        strips = _strips(group, axis)
+        if len(strips) > 1:
+            for strip in strips:
+                if len(strip) > 1:
+                    yield strip
+                    yield from _blocks(strip)
+            return
+
+
+def _strips(group: list[tuple[Piece, Cutout]], axis: int) -> list[list[tuple[Piece, Cutout]]]:
+    ordered = sorted(group, key=lambda pc: pc[1].position_tl[axis])
+    strips: list[list[tuple[Piece, Cutout]]] = []
+    end = None
+    for piece, cutout in ordered:
+        start = cutout.position_tl[axis]
+        if end is None or start >= end:
+            strips.append([])
+            end = start
+        strips[-1].append((piece, cutout))
+        end = max(end, start + cutout.dimensions[axis])
+    return strips
@@ -12,14 +12,18 @@ from .board import Board
 import time
 from .solution import Solution, Cutout
 from .solver_opt import SolverOpt
+from .solver_exact import SolverExact, EXACT_MAX_PIECES, MAX_NODES
+from .pattern_library import PatternLibrary, Pattern
 
 
 class Solver:
 
-    def __init__(self, height: float, width: float, saw_width: float, pieces: list[Piece]):
+    def __init__(self, height: float, width: float, saw_width: float, pieces: list[Piece],
+                 library: PatternLibrary | None = None):
         '''problem description format: `B:1200x800 S:2.5 450x300 500x600r 2x450x600`'''
         self.board = Board(height, width, saw_width)
         self.pieces = pieces
+        self.library = library
 
     @staticmethod
     def from_str(problem_description: str):
@@ -49,12 +53,56 @@ class Solver:
         return dict(height=height, width=width, saw_width=saw_width, pieces=pieces)
 
     def solve(self, timeout_sec: float = 5) -> Solution:
-        solution = SolverFit(self.board, self.pieces)._fit_pieces(
+        if self.library is None:
+            return self._solve(self.pieces, timeout_sec)
+        matches = self.library.match(self.pieces, self.board.saw_width)
+        solution = self._solve_with_patterns(
+            matches, timeout_sec) if matches else None
+        if solution is None:
+            solution, matches = self._solve(self.pieces, timeout_sec), []
+        elif len(self.pieces) <= EXACT_MAX_PIECES:
+            # patterns are fixed blocks, when the job is cheap keep them only if the layout is no worse
+            plain = self._solve(self.pieces, timeout_sec)
+            if not plain.unfits and self._used_length(plain) < self._used_length(solution):
+                solution, matches = plain, []
+        covered = sum(len(indices) for _, indices in matches)
+        self.library.count(hits=covered, misses=len(self.pieces) - covered)
+        self.library.record(solution, self.pieces)
+        return solution
+
+    def _used_length(self, solution: Solution) -> float:
+        '''Where the leftover starts, in the direction `SolverOpt` minimizes'''
+        (y, x) = solution.leftover[0].position_tl
+        return y if self.board.height > self.board.width else x
+
+    def _solve_with_patterns(self, matches: list[tuple[Pattern, list[int]]], timeout_sec: float) -> Solution | None:
+        '''Solves with every matched group as a single piece, None if something does not fit anymore'''
+        grouped = set(i for _, indices in matches for i in indices)
+        singles = [i for i in range(len(self.pieces)) if i not in grouped]
+        pieces = [pattern.as_piece() for pattern, _ in matches] + \
+            [self.pieces[i] for i in singles]
+        solution = self._solve(pieces, timeout_sec)
+        if solution.unfits:
+            logging.info("Patterns do not fit, solving without them")
+            return None
+        by_piece: dict[int, Cutout] = {}
+        for (pattern, indices), cutout in zip(matches, solution.cutouts):
+            by_piece.update(zip(indices, pattern.place(cutout)))
+        by_piece.update(zip(singles, solution.cutouts[len(matches):]))
+        cutouts = [by_piece[i] for i in range(len(self.pieces))]
+        return Solution(cutouts=cutouts, leftover=solution.leftover, unfits=[], board=self.board)
+
+    def _solve(self, pieces: list[Piece], timeout_sec: float) -> Solution:
+        if len(pieces) <= EXACT_MAX_PIECES:
+            solution = SolverExact(self.board, pieces, max_nodes=MAX_NODES).solve()
+            if solution is not None:
+                return solution
+        solution = SolverFit(self.board, pieces)._fit_pieces(
             timeout_sec=timeout_sec)
         n_picked = len(solution.cutouts)
-        if n_picked < len(self.pieces):
+        if n_picked < len(pieces):
             return solution
-        solver_opt = SolverOpt(self.board, self.pieces)
+        solver_opt = SolverOpt(self.board, pieces)
         return solver_opt.solve_opt(timeout_sec=timeout_sec)
 
 
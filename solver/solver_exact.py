@@ -0,0 +1,297 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from itertools import product
+from math import gcd
+import logging
+import time
+from .piece import Piece
+from .board import Board
+from .solution import Solution, Cutout
+
+EXACT_MAX_PIECES = 6
+'''Jobs with at most this many pieces are first tried with `SolverExact`'''
+
+MAX_NODES = 3_000
+'''Search nodes `SolverExact` may visit before giving the job back to OR-Tools, about 70 ms'''
+
+type Frontier = tuple[tuple[int, int], ...]
+type Placement = tuple[int, int, int, int, int]
+
+
+@dataclass(frozen=True)
+class _Kind:
+    '''Interchangeable pieces, dimensions are inflated by the saw width'''
+    orientations: tuple[tuple[int, int], ...]
+    area_tmm: int
+    indices: tuple[int, ...]
+    narrowest: int
+    shortest: int
+
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+class SolverExact:
+    '''Branch and bound over corner points, proves optimality for small jobs without OR-Tools.
+
+    Every piece is inflated by the saw width (and so is the board) so pieces can touch.
+    The search always minimizes along y, boards that are not taller than wide are transposed
+    the same way `SolverOpt` switches from `lower_limit` to `rightmost_limit`.
+    Pieces are placed at the corner points of the envelope of the already placed pieces,
+    the state (envelope, remaining pieces) is memoized: once explored it can never improve
+    on the incumbent again.
+    '''
+    pieces: list[Piece]
+    board: Board
+
+    def __init__(self, board: Board, pieces: list[Piece], max_nodes: int = MAX_NODES):
+        self.board = board
+        self.pieces = pieces
+        self.max_nodes = max_nodes
+        self.transposed = board.height <= board.width
+        self.kinds = self._group_kinds()
+
+    def solve(self) -> Solution | None:
+        '''Returns None when the search budget runs out'''
+        start_time = time.time()
+        self.nodes = 0
+        try:
+            solution = self._solve_opt() or self._fit_pieces()
+        except SearchBudgetExceeded:
+            logging.info(
+                f"Exact solver gave up after {self.nodes} nodes")
+            return None
+        logging.debug(f"Exact solver took {time.time()-start_time}")
+        return solution
+
+    def _group_kinds(self) -> list[_Kind]:
+        '''Groups identical pieces, everything is scaled down by the gcd of all the lengths'''
+        sw = self.board.saw_width_tmm
+        depth, span = self.board.height_tmm + sw, self.board.width_tmm + sw
+        if self.transposed:
+            depth, span = span, depth
+        dimensions = []
+        for piece in self.pieces:
+            h, w = piece.height_tmm, piece.width_tmm
+            dimensions.append((w, h) if self.transposed else (h, w))
+        self.unit = gcd(depth, span, *(length + sw for dims in dimensions for length in dims))
+        self.depth, self.span = depth//self.unit, span//self.unit
+        groups: dict[tuple, list[int]] = {}
+        for i, (piece, (h, w)) in enumerate(zip(self.pieces, dimensions)):
+            h, w = (h + sw)//self.unit, (w + sw)//self.unit
+            orientations = [(h, w)]
+            if piece.can_rotate and h != w:
+                orientations.append((w, h))
+            key = (tuple(sorted(orientations)), piece.height_tmm*piece.width_tmm)
+            groups.setdefault(key, []).append(i)
+        kinds = [_Kind(orientations, area, tuple(indices),
+                       narrowest=min(w for h, w in orientations),
+                       shortest=min(h for h, w in orientations))
+                 for (orientations, area), indices in groups.items()]
+        # big pieces first so the first descent gives a good incumbent
+        kinds.sort(key=lambda kind: -kind.orientations[0][0]*kind.orientations[0][1])
+        return kinds
+
+    def _reset(self):
+        self.visited: set[tuple[Frontier, tuple[int, ...]]] = set()
+        self.widths: dict[tuple[int, ...], int] = {}
+        self.heights: dict[tuple[int, ...], int] = {}
+        self.path: list[Placement] = []
+        self.best_layout: list[Placement] | None = None
+
+    def _solve_opt(self) -> Solution | None:
+        '''Minimizes the depth used by all the pieces, None if they do not all fit'''
+        self._reset()
+        self.best_depth = self.depth + 1
+        self.target = 0
+        counts = tuple(len(kind.indices) for kind in self.kinds)
+        self._pack((), counts)
+        if self.best_layout is None:
+            return None
+        cutouts, _ = self._cutouts(self.best_layout)
+        limit = max(self.best_depth*self.unit - self.board.saw_width_tmm, 0)/10
+        if self.transposed:
+            leftover = Cutout(position_tl=(0, limit), dimensions=(
+                self.board.height, self.board.width - limit))
+        else:
+            leftover = Cutout(position_tl=(limit, 0), dimensions=(
+                self.board.height - limit, self.board.width))
+        return Solution(cutouts=cutouts, unfits=[], leftover=[leftover], board=self.board)
+
+    def _fit_pieces(self) -> Solution:
+        '''Packs the subset of pieces with the largest area that fits.
+
+        Subsets are tried by decreasing area, the first one that fits is optimal. A state that
+        did not fit for one subset does not fit for any other so the memo is kept across subsets.
+        '''
+        self._reset()
+        self.best_depth = self.depth + 1
+        self.target = self.depth
+        counts = tuple(len(kind.indices) for kind in self.kinds)
+        subsets = sorted(product(*(range(count + 1) for count in counts)),
+                         key=lambda subset: -sum(n*kind.area_tmm for n, kind in zip(subset, self.kinds)))
+        for subset in subsets:
+            if subset == counts:
+                continue
+            self._pack((), subset)
+            if self.best_layout is not None:
+                break
+        assert self.best_layout is not None
+        cutouts, picked = self._cutouts(self.best_layout)
+        unfits = [Cutout(position_tl=(0, 0), dimensions=(p.height, p.width))
+                  for i, p in enumerate(self.pieces) if i not in picked]
+        return Solution(cutouts=cutouts, leftover=[], unfits=unfits, board=self.board)
+
+    def _pack(self, frontier: Frontier, counts: tuple[int, ...]):
+        self._count_node()
+        if not any(counts):
+            top = frontier[0][1] if frontier else 0
+            if top < self.best_depth:
+                self.best_depth = top
+                self.best_layout = list(self.path)
+            return
+        remaining = [kind for kind, count in zip(self.kinds, counts) if count]
+        narrowest = min(kind.narrowest for kind in remaining)
+        frontier = _clamp(frontier, self.span - narrowest, self.depth, self.span, self.depth)
+        key = (frontier, counts)
+        if key in self.visited:
+            return
+        self.visited.add(key)
+        corners = _corners(frontier)
+        for kind in remaining:
+            lowest = min((y + h for h, w in kind.orientations for x, y in corners
+                          if x + w <= self.span), default=self.depth + 1)
+            if lowest >= self.best_depth:
+                return
+        if self._depth_bound(frontier, counts) >= self.best_depth:
+            return
+        if not self._fits_columns(frontier, counts, self.best_depth - 1):
+            return
+        for k, (kind, count) in enumerate(zip(self.kinds, counts)):
+            if not count:
+                continue
+            next_counts = counts[:k] + (count - 1,) + counts[k+1:]
+            for h, w in kind.orientations:
+                for x, y in corners:
+                    if x + w > self.span or y + h >= self.best_depth:
+                        continue
+                    self.path.append((k, x, y, h, w))
+                    self._pack(_push(frontier, x + w, y + h), next_counts)
+                    self.path.pop()
+                    if self.best_depth <= self.target:
+                        return
+
+    def _depth_bound(self, frontier: Frontier, counts: tuple[int, ...]) -> int:
+        '''Lower bound on the depth used once the remaining pieces are placed.
+
+        A row holds at most the best combination of remaining widths that fits in its free
+        width, the rows next to the envelope are used first and the rest comes below it.
+        '''
+        widths = self._reachable(self.widths, counts, 1)
+        remaining_area = sum(count*kind.orientations[0][0]*kind.orientations[0][1]
+                             for kind, count in zip(self.kinds, counts))
+        for (x, y), (_, next_y) in zip(frontier, frontier[1:] + ((0, 0),)):
+            remaining_area -= (y - next_y)*_largest_sum(widths, self.span - x)
+        top = frontier[0][1] if frontier else 0
+        fill = _largest_sum(widths, self.span)
+        if not fill:
+            return self.depth + 1
+        bound = top + max(-(-remaining_area//fill), 0)
+        # pieces wider than half the board never share a row
+        wide = [(kind, count) for kind, count in zip(self.kinds, counts)
+                if count and kind.narrowest*2 > self.span]
+        if wide:
+            narrowest = min(kind.narrowest for kind, _ in wide)
+            bound = max(bound, _first_row(frontier, self.span - narrowest) + sum(
+                count*kind.shortest for kind, count in wide))
+        return bound
+
+    def _fits_columns(self, frontier: Frontier, counts: tuple[int, ...], depth: int) -> bool:
+        '''Same argument as `_depth_bound` but column by column for a given depth'''
+        heights = self._reachable(self.heights, counts, 0)
+        remaining_area = sum(count*kind.orientations[0][0]*kind.orientations[0][1]
+                             for kind, count in zip(self.kinds, counts))
+        previous_x = 0
+        for x, y in frontier + ((self.span, 0),):
+            remaining_area -= (x - previous_x)*_largest_sum(heights, depth - y)
+            previous_x = x
+        return remaining_area <= 0
+
+    def _reachable(self, cache: dict[tuple[int, ...], int], counts: tuple[int, ...], axis: int) -> int:
+        '''Bitset of the lengths along `axis` the remaining pieces can add up to'''
+        if counts in cache:
+            return cache[counts]
+        mask = (1 << (max(self.span, self.depth) + 1)) - 1
+        reachable = 1
+        for kind, count in zip(self.kinds, counts):
+            for _ in range(count):
+                shifted = reachable
+                for orientation in kind.orientations:
+                    shifted |= reachable << orientation[axis]
+                reachable = shifted & mask
+        cache[counts] = reachable
+        return reachable
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise SearchBudgetExceeded()
+
+    def _cutouts(self, layout: list[Placement]) -> tuple[list[Cutout], set[int]]:
+        '''Converts a layout back to the board orientation, cutouts are in the order of the pieces'''
+        sw = self.board.saw_width_tmm
+        available = [list(kind.indices) for kind in self.kinds]
+        by_piece: dict[int, Cutout] = {}
+        for k, x, y, h, w in layout:
+            i = available[k].pop(0)
+            x, y, h, w = x*self.unit, y*self.unit, h*self.unit - sw, w*self.unit - sw
+            tly, tlx, height, width = (x, y, w, h) if self.transposed else (y, x, h, w)
+            by_piece[i] = Cutout(position_tl=(tly/10, tlx/10),
+                                 dimensions=(height/10, width/10))
+        return [by_piece[i] for i in sorted(by_piece)], set(by_piece)
+
+
+def _corners(frontier: Frontier) -> list[tuple[int, int]]:
+    '''The (x, y) corner points of the envelope, frontier is sorted by x ascending, y descending'''
+    corners = []
+    previous_x = 0
+    for x, y in frontier:
+        corners.append((previous_x, y))
+        previous_x = x
+    corners.append((previous_x, 0))
+    return corners
+
+
+def _push(frontier: Frontier, x: int, y: int) -> Frontier:
+    '''Adds the bottom right corner of a newly placed piece to the envelope'''
+    kept = [(fx, fy) for fx, fy in frontier if fx > x or fy > y]
+    kept.append((x, y))
+    kept.sort()
+    return tuple(kept)
+
+
+def _clamp(frontier: Frontier, x_max: int, y_max: int, span: int, depth: int) -> Frontier:
+    '''Pushes the envelope to the board edge where no remaining piece fits anymore'''
+    points = sorted(((span if x > x_max else x, depth if y > y_max else y)
+                     for x, y in frontier), reverse=True)
+    kept: list[tuple[int, int]] = []
+    for x, y in points:
+        if not kept or y > kept[-1][1]:
+            kept.append((x, y))
+    return tuple(reversed(kept))
+
+
+def _largest_sum(reachable: int, length: int) -> int:
+    '''Largest reachable length that is not above `length`'''
+    if length < 0:
+        return 0
+    return (reachable & ((1 << (length + 1)) - 1)).bit_length() - 1
+
+
+def _first_row(frontier: Frontier, x_max: int) -> int:
+    '''First y from which the envelope leaves everything right of x_max free'''
+    for x, y in frontier:
+        if x > x_max:
+            return y
+    return 0
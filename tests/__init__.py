@@ -0,0 +1,11 @@
+def assert_no_overlap(cutouts, board):
+    for c in cutouts:
+        (y, x), (h, w) = c.position_tl, c.dimensions
+        assert y + h <= board.height and x + w <= board.width
+    for i, a in enumerate(cutouts):
+        for b in cutouts[i+1:]:
+            (ay, ax), (ah, aw) = a.position_tl, a.dimensions
+            (by, bx), (bh, bw) = b.position_tl, b.dimensions
+            sw = board.saw_width
+            assert (ay + ah + sw <= by or by + bh + sw <= ay or
+                    ax + aw + sw <= bx or bx + bw + sw <= ax), f"{a} overlaps {b}"
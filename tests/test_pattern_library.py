@@ -0,0 +1,109 @@
+from solver import Solver, Solution, Piece, Board, PatternLibrary, Cutout
+from solver.pattern_library import Pattern, piece_key
+from concurrent.futures import ThreadPoolExecutor
+from tests import assert_no_overlap
+
+
+def carcass():
+    return [Piece(700, 300), Piece(700, 300), Piece(400, 200)]
+
+
+def record_group(library, group, height=2500, width=1200, saw_width=3):
+    '''Records the group as a block of a job that also cuts a small piece below it'''
+    solution = Solver(height, width, saw_width, group).solve()
+    depth = solution.leftover[0].position_tl[0]
+    solution.cutouts.append(Cutout((depth + saw_width, 0), (50, 50)))
+    library.record(solution, group + [Piece(50, 50)])
+
+
+def test_record_and_match():
+    library = PatternLibrary()
+    record_group(library, carcass())
+    assert len(library) > 0
+    job = carcass() + [Piece(500, 500)] + carcass()
+    matches = library.match(job, 3)
+    assert [len(indices) for _, indices in matches] == [3, 3]
+    assert library.match(job, 4) == []
+
+
+def test_whole_job_is_not_recorded():
+    library = PatternLibrary()
+    pieces = [Piece(100, 100), Piece(100, 100)]
+    library.record(Solver(2500, 1200, 3, pieces).solve(), pieces)
+    assert len(library) == 0
+
+
+def test_block_is_packed_on_its_own():
+    library = PatternLibrary()
+    pieces = [Piece(400, 300), Piece(200, 100), Piece(50, 50)]
+    cutouts = [Cutout((0, 0), (400, 300)), Cutout((0, 600), (200, 100)),
+               Cutout((500, 0), (50, 50))]
+    library.record(Solution(cutouts=cutouts, leftover=[], unfits=[],
+                            board=Board(1200, 800, 3)), pieces)
+    [(pattern, _)] = library.match(pieces[:2], 3)
+    assert (pattern.height, pattern.width) == (400, 403)
+
+
+def test_incomplete_solution_is_not_recorded():
+    library = PatternLibrary()
+    pieces = carcass() + [Piece(3000, 100)]
+    solution = Solver(2500, 1200, 3, pieces).solve()
+    assert solution.unfits
+    library.record(solution, pieces)
+    assert len(library) == 0
+
+
+def test_lru_eviction():
+    library = PatternLibrary(capacity=1)
+    for group in (carcass(), [Piece(100, 100), Piece(100, 100)]):
+        record_group(library, group)
+    assert len(library) == 1
+    assert library.match(carcass(), 3) == []
+
+
+def test_shared_between_threads():
+    library = PatternLibrary(capacity=2)
+    groups = [[Piece(100*k, 100), Piece(100*k, 100)] for k in range(1, 7)]
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda group: record_group(library, group), groups))
+        list(pool.map(lambda group: library.match(group, 3), groups))
+    assert len(library) == 2
+
+
+def test_pattern_place_turned():
+    pattern = Pattern(members=(piece_key(Piece(100, 50, True)), piece_key(Piece(100, 30, True))),
+                      cutouts=(Cutout((0, 0), (100, 50)), Cutout((0, 53), (100, 30))),
+                      height=100, width=83, saw_width=3)
+    cutouts = pattern.place(Cutout((10, 20), (83, 100)))
+    assert cutouts == [Cutout((10, 20), (50, 100)), Cutout((63, 20), (30, 100))]
+
+
+def test_solver_with_library(monkeypatch):
+    library = PatternLibrary()
+    record_group(library, [Piece(600, 297), Piece(600, 297)])
+    job = [Piece(600, 297) for _ in range(8)]
+    plain = Solver(2500, 1200, 3, job).solve()
+    solved = []
+    solve = Solver._solve
+    monkeypatch.setattr(Solver, '_solve', lambda self, pieces, timeout_sec: solved.append(
+        len(pieces)) or solve(self, pieces, timeout_sec))
+    solution = Solver(2500, 1200, 3, job, library=library).solve()
+    assert solved == [4]
+    assert not solution.unfits
+    assert [c.dimensions for c in solution.cutouts] == [(600, 297)]*8
+    assert_no_overlap(solution.cutouts, solution.board)
+    assert solution.leftover[0].position_tl <= plain.leftover[0].position_tl
+    assert library.hit_rate == 1
+
+
+def test_library_is_no_worse():
+    library = PatternLibrary()
+    group = [Piece(400, 300), Piece(200, 100)]
+    record_group(library, group, 1200, 800)
+    job = group + [Piece(400, 300), Piece(200, 100)]
+    assert len(library.match(job, 3)) == 2
+    plain = Solver(1200, 800, 3, job).solve()
+    solution = Solver(1200, 800, 3, job, library=library).solve()
+    assert plain.leftover[0].position_tl == (403, 0)
+    assert solution.leftover[0].position_tl == plain.leftover[0].position_tl
+    assert library.hit_rate == 0
@@ -1,8 +1,11 @@
 import pytest
 
-from solver import Solver
+from solver import Solver, Piece
 from solver.solver import SolverFit, Board
+from solver.solver_exact import SolverExact, EXACT_MAX_PIECES
+import solver.solver
 import pickle
+from tests import assert_no_overlap
 
 
 @pytest.fixture
@@ -26,12 +29,41 @@ def test_solver(test_cases):
     for test_case in test_cases:
         problem, reference_solution = test_case['problem'], test_case['solution']
         current_solution = Solver(**problem).solve(timeout_sec=3)
-        assert len(current_solution.unfits) == len(
-            reference_solution.unfits)
-        if current_solution.leftover:
-            assert current_solution.leftover[0].dimensions == reference_solution.leftover[0].dimensions
-            assert set(c.straightened_dimensions for c in reference_solution.cutouts) == set(
-                c.straightened_dimensions for c in current_solution.cutouts)
-        else:
-            assert set(c.dimensions[0]*c.dimensions[1] for c in reference_solution.cutouts) == set(
-                c.dimensions[0] * c.dimensions[1] for c in current_solution.cutouts)
+        assert_like_reference(current_solution, reference_solution)
+
+
+def test_solver_above_exact_max_pieces(monkeypatch):
+    def exact_solver(*args, **kwargs):
+        raise AssertionError("SolverExact should not be used")
+    monkeypatch.setattr(solver.solver, 'SolverExact', exact_solver)
+    pieces = [Piece(600, 297) for _ in range(EXACT_MAX_PIECES + 1)]
+    solution = Solver(2500, 1200, 3, pieces).solve(timeout_sec=3)
+    assert not solution.unfits
+    assert solution.leftover[0].position_tl == (1203, 0)
+    assert_no_overlap(solution.cutouts, solution.board)
+
+
+def test_solver_exact_gives_up(test_cases, monkeypatch):
+    monkeypatch.setattr(solver.solver, 'EXACT_MAX_PIECES', 7)
+    monkeypatch.setattr(solver.solver, 'MAX_NODES', 10)
+    exact_solutions = []
+    exact_solve = SolverExact.solve
+    monkeypatch.setattr(SolverExact, 'solve', lambda self: exact_solutions.append(
+        exact_solve(self)) or exact_solutions[-1])
+    for test_case in test_cases[:3]:
+        problem, reference_solution = test_case['problem'], test_case['solution']
+        current_solution = Solver(**problem).solve(timeout_sec=3)
+        assert_like_reference(current_solution, reference_solution)
+    assert exact_solutions == [None]*3
+
+
+def assert_like_reference(current_solution, reference_solution):
+    assert len(current_solution.unfits) == len(
+        reference_solution.unfits)
+    if current_solution.leftover:
+        assert current_solution.leftover[0].dimensions == reference_solution.leftover[0].dimensions
+        assert set(c.straightened_dimensions for c in reference_solution.cutouts) == set(
+            c.straightened_dimensions for c in current_solution.cutouts)
+    else:
+        assert set(c.dimensions[0]*c.dimensions[1] for c in reference_solution.cutouts) == set(
+            c.dimensions[0] * c.dimensions[1] for c in current_solution.cutouts)
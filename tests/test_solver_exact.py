@@ -0,0 +1,41 @@
+import pytest
+
+from solver import Solver, Piece, Board
+from solver.solver_exact import SolverExact
+from tests import assert_no_overlap
+import pickle
+
+
+@pytest.fixture
+def test_cases():
+    with open('tests/pickled_solver_test_cases.bin', 'rb') as f:
+        test_cases = pickle.load(f)
+    return test_cases
+
+
+def test_exact_solver(test_cases):
+    for test_case in test_cases:
+        problem, reference_solution = test_case['problem'], test_case['solution']
+        solver = Solver(**problem)
+        current_solution = SolverExact(solver.board, solver.pieces, max_nodes=10_000).solve()
+        assert current_solution is not None
+        assert len(current_solution.unfits) == len(reference_solution.unfits)
+        if reference_solution.leftover:
+            assert current_solution.leftover[0].dimensions == reference_solution.leftover[0].dimensions
+        assert_no_overlap(current_solution.cutouts, solver.board)
+
+
+def test_exact_solver_rotates_and_transposes():
+    board = Board(600, 1000, 5)
+    pieces = [Piece(400, 600, can_rotate=True), Piece(600, 200)]
+    solution = SolverExact(board, pieces).solve()
+    assert solution is not None
+    assert solution.cutouts[0].dimensions == (600, 400)
+    assert solution.leftover[0].position_tl == (0, 605)
+    assert solution.leftover[0].dimensions == (600, 395)
+
+
+def test_exact_solver_gives_up(test_cases):
+    solver = Solver(**test_cases[0]['problem'])
+    assert SolverExact(solver.board, solver.pieces, max_nodes=10).solve() is None
+
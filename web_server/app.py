@@ -2,7 +2,7 @@ import sys
 import os
 from fastapi import FastAPI
 from . import schemata
-from solver import Solver, Piece as SolverPiece
+from solver import Solver, PatternLibrary, Piece as SolverPiece
 import base64
 from illustrate import BoardIllustrator
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,6 +13,7 @@ app.add_middleware(CORSMiddleware, allow_origins=[
                    '*'], allow_methods=['*'], allow_headers=['*'])
 dist_path = os.path.join('frontend', 'dist')
 app.mount("/static", StaticFiles(directory=dist_path), name="static")
+pattern_library = PatternLibrary()
 
 
 @app.get('/api')
@@ -25,7 +26,7 @@ def create_problem(problem: schemata.Problem):
     pieces: list[SolverPiece] = [SolverPiece(
         p.height, p.width, p.canRotate) for p in problem.pieces]
     solver = Solver(problem.board.height, problem.board.width,
-                    problem.sawWidth, pieces)
+                    problem.sawWidth, pieces, library=pattern_library)
     solution = solver.solve()
     illustrator = BoardIllustrator(problem.board.height, problem.board.width)
     for cutout in solution.cutouts: